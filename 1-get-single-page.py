@@ -1,17 +1,36 @@
+import functools
 import os
-import json
-from docling.document_converter import DocumentConverter
-from groq import Groq
+import httpx
+import trafilatura
 from pydantic import BaseModel, HttpUrl
+from types import MappingProxyType
 from typing import Literal # Needed for the structured output type
 from dotenv import load_dotenv
 
+from llm_cache import cached_completion
+
 
 load_dotenv()
-# Ensure the GROQ_API_KEY is set in your environment
-client = Groq(
-    api_key=os.getenv('GROQ_API_KEY'),)
-converter = DocumentConverter()
+
+# One keep-alive connection pool shared by the page fetches and the Groq client,
+# so repeated requests to a host reuse the TCP/TLS connection
+http_client = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+    timeout=60,
+)
+
+
+@functools.lru_cache(maxsize=1)
+def get_client():
+    """Create the Groq client on first use, so cache hits never import groq."""
+    from groq import Groq
+
+    # Ensure the GROQ_API_KEY is set in your environment
+    return Groq(
+        api_key=os.getenv('GROQ_API_KEY'),
+        http_client=http_client,)
+
 
 # Using the correct, recommended model for Groq API
 MODEL = "llama-3.3-70b-versatile"
@@ -30,70 +49,124 @@ class Summary(BaseModel):
     summary: str
 
 # --------------------------------------------------------------
-# Extract content from a web page
+# Extract content from web pages
 # --------------------------------------------------------------
 
-test_url = "https://www.europarl.europa.eu/topics/en/article/20230601STO93804/eu-ai-act-first-regulation-on-artificial-intelligence"
-
-source = Source(url=test_url)
-print(f"Fetching and converting content from: {source.url}")
+@functools.lru_cache(maxsize=1)
+def get_converter():
+    """Build the docling converter once; its layout models are expensive to load."""
+    # docling pulls in torch and its models, so only import it when a document needs it
+    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.pipeline_options import AcceleratorDevice, AcceleratorOptions, PdfPipelineOptions
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+
+    # HTML goes through trafilatura, so docling only sees PDFs and other documents:
+    # keep OCR and table extraction on, and just use every core (or a GPU) for them
+    pipeline_options = PdfPipelineOptions()
+    pipeline_options.accelerator_options = AcceleratorOptions(
+        num_threads=os.cpu_count(), device=AcceleratorDevice.AUTO
+    )
+    return DocumentConverter(
+        format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)}
+    )
 
-try:
-    # docling returns a Document object which has an export_to_markdown method
-    page_content = converter.convert(str(source.url))
-    markdown_content = page_content.document.export_to_markdown()
-except Exception as e:
-    print(f"Error converting document: {e}")
-    # Use a placeholder or exit if content extraction fails
-    markdown_content = "Failed to extract content."
 
-# print(markdown_content) # Uncomment if you want to see the raw markdown
+def is_html(url: str) -> bool:
+    """Check the content type with a HEAD request to pick the extraction path."""
+    response = http_client.head(url, follow_redirects=True)
+    return "html" in response.headers.get("content-type", "")
+
+
+test_urls = [
+    "https://www.europarl.europa.eu/topics/en/article/20230601STO93804/eu-ai-act-first-regulation-on-artificial-intelligence",
+]
+
+sources = [Source(url=url) for url in test_urls]
+markdown_contents = ["Failed to extract content."] * len(sources)
+docling_indices = []
+
+for i, source in enumerate(sources):
+    print(f"Fetching and converting content from: {source.url}")
+    try:
+        markdown_content = None
+        if is_html(str(source.url)):
+            # Plain HTML needs no layout analysis: trafilatura extracts the main
+            # content in milliseconds instead of loading docling's models
+            html = http_client.get(str(source.url), follow_redirects=True).text
+            markdown_content = trafilatura.extract(html, output_format="markdown")
+        if markdown_content:
+            markdown_contents[i] = markdown_content
+        else:
+            # Non-HTML documents (or pages trafilatura cannot read) go through docling
+            docling_indices.append(i)
+    except Exception as e:
+        print(f"Error converting document: {e}")
+
+if docling_indices:
+    from docling.datamodel.base_models import ConversionStatus
+
+    try:
+        # convert_all shares one converter (and its loaded models) across all URLs
+        page_contents = get_converter().convert_all(
+            [str(sources[i].url) for i in docling_indices], raises_on_error=False
+        )
+        for i, page_content in zip(docling_indices, page_contents):
+            if page_content.status == ConversionStatus.SUCCESS:
+                # docling returns a Document object which has an export_to_markdown method
+                markdown_contents[i] = page_content.document.export_to_markdown()
+            else:
+                print(f"Error converting document: {page_content.input.file}")
+    except Exception as e:
+        print(f"Error converting document: {e}")
+
+# print(markdown_contents) # Uncomment if you want to see the raw markdown
 
 # --------------------------------------------------------------
 # Generate summary using Groq Chat Completions API
 # --------------------------------------------------------------
 
-# Define the structured response schema based on the Pydantic model
-summary_schema = Summary.model_json_schema()
+# Define the structured response schema based on the Pydantic model (once, read-only)
+summary_schema = MappingProxyType(Summary.model_json_schema())
 
 # The system prompt sets the context and goal
 SYSTEM_PROMPT = "You are an assistant that retrieves the content of a web page and provides a short, concise summary of it. Your output MUST be a valid JSON object that strictly follows the provided schema."
 
-# The user message contains the content to be summarized
-USER_MESSAGE = f"Please give a short summary of this website content, focusing on the key points of the EU AI Act:\n\n{markdown_content}"
-
-print("\nGenerating summary via Groq API...")
-
-try:
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": USER_MESSAGE},
-        ],
-        # --- Crucial change for Pydantic/JSON output ---
-        response_format={
-            "type": "json_object",
-            "schema": summary_schema
-        },
-        temperature=0.0 # Use low temperature for summarization tasks
-    )
-
-    # Extract the JSON string from the response
-    json_string = response.choices[0].message.content
-    
-    # Parse the JSON string and validate it against the Pydantic model
-    summary_data = json.loads(json_string)
-    result = Summary.model_validate(summary_data)
-
-    # --------------------------------------------------------------
-    # Print the result
-    # --------------------------------------------------------------
-
-    print("\n✅ Summary Generated:")
-    print("-" * 20)
-    print(result.summary)
-
-except Exception as e:
-    print(f"\n❌ An error occurred during API call or parsing: {e}")
-    print("Please ensure your GROQ_API_KEY is set and the model name is correct.")
\ No newline at end of file
+for source, markdown_content in zip(sources, markdown_contents):
+    # The user message contains the content to be summarized
+    USER_MESSAGE = f"Please give a short summary of this website content, focusing on the key points of the EU AI Act:\n\n{markdown_content}"
+
+    print(f"\nGenerating summary of {source.url} via Groq API...")
+
+    try:
+        # Served from the local prompt cache when this page was summarized before
+        json_string = cached_completion(
+            get_client,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": USER_MESSAGE},
+            ],
+            # --- Crucial change for Pydantic/JSON output ---
+            schema=summary_schema,
+            model=MODEL,
+            # Only well-formed summaries are cached
+            validate=Summary.model_validate_json,
+            # Exact matches only: the embedding model sees just the instruction and the
+            # start of the page, so different pages of one site would look alike
+            semantic=False,
+            temperature=0.0 # Use low temperature for summarization tasks
+        )
+
+        # Parse and validate the JSON string against the Pydantic model in one pass
+        result = Summary.model_validate_json(json_string)
+
+        # --------------------------------------------------------------
+        # Print the result
+        # --------------------------------------------------------------
+
+        print("\n✅ Summary Generated:")
+        print("-" * 20)
+        print(result.summary)
+
+    except Exception as e:
+        print(f"\n❌ An error occurred during API call or parsing: {e}")
+        print("Please ensure your GROQ_API_KEY is set and the model name is correct.")
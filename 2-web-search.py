@@ -1,17 +1,27 @@
 import os
-import json
+import functools
 from typing import List, Literal
-from groq import Groq
 from pydantic import BaseModel
+from types import MappingProxyType
 
 from dotenv import load_dotenv
 
+from llm_cache import cached_completion
+
 
 load_dotenv()
 #print(os.getenv('GROQ_API_KEY'))
-# Initialize the Groq client
-client = Groq(
-    api_key=os.getenv('GROQ_API_KEY'),)
+
+
+@functools.lru_cache(maxsize=1)
+def get_client():
+    """Create the Groq client on first use, so cache hits never import groq."""
+    from groq import Groq
+
+    return Groq(
+        api_key=os.getenv('GROQ_API_KEY'),)
+
+
 # Using a commonly available Llama 3 model for Groq
 MODEL = "llama-3.3-70b-versatile"
 # --------------------------------------------------------------
@@ -28,8 +38,8 @@ class SearchResult(BaseModel):
     answer: str
     citations: List[Citation]
 
-# Generate the JSON schema from the Pydantic model
-search_result_schema = SearchResult.model_json_schema()
+# Generate the JSON schema from the Pydantic model (once, read-only)
+search_result_schema = MappingProxyType(SearchResult.model_json_schema())
 
 # --------------------------------------------------------------
 # Configure and Execute the Query
@@ -47,26 +57,23 @@ For each piece of information in your answer, you MUST provide a corresponding c
 print(f"Executing query using model: {MODEL}")
 
 try:
-    response = client.chat.completions.create(
-        model=MODEL,
+    # Served from the local prompt cache when this query was answered before
+    json_string = cached_completion(
+        get_client,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": query},
         ],
         # --- Crucial for structured Pydantic output ---
-        response_format={
-            "type": "json_object",
-            "schema": search_result_schema
-        },
+        schema=search_result_schema,
+        model=MODEL,
+        # Only well-formed results are cached
+        validate=SearchResult.model_validate_json,
         temperature=0.0 # Use low temperature for factual synthesis/summarization
     )
-
-    # Extract the JSON string from the response
-    json_string = response.choices[0].message.content
     
-    # Parse the JSON string and validate it against the Pydantic model
-    summary_data = json.loads(json_string)
-    result = SearchResult.model_validate(summary_data)
+    # Parse and validate the JSON string against the Pydantic model in one pass
+    result = SearchResult.model_validate_json(json_string)
 
     # --------------------------------------------------------------
     # Print the result
@@ -1,20 +1,59 @@
+import asyncio
+import contextlib
+import functools
 import os
-import json
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
 from pathlib import Path
-from typing import List
-from groq import Groq
-from pydantic import BaseModel, Field
+from types import MappingProxyType
+from typing import Annotated, Callable, List, Literal, Optional, Union
+import httpx
+import ijson
+from ijson.common import ObjectBuilder
+import numpy as np
+import orjson
+from pydantic import BaseModel, Field, TypeAdapter
 from dotenv import load_dotenv
 
+from llm_cache import async_cached_completion, async_create_completion, get_embedder
+
 
 load_dotenv()
-# Ensure GROQ_API_KEY is set in your environment
-client = Groq(
-    api_key=os.getenv('GROQ_API_KEY'),)
+
+
+@functools.lru_cache(maxsize=1)
+def get_client():
+    """Create the async Groq client on first use."""
+    from groq import AsyncGroq
+
+    # HTTP/2 lets the concurrent agent calls share (multiplex) one connection
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+        timeout=60,
+    )
+    # Ensure GROQ_API_KEY is set in your environment
+    return AsyncGroq(
+        api_key=os.getenv('GROQ_API_KEY'),
+        http_client=http_client,)
+
 
 # Use a standard, high-performing Groq model
 MODEL = "llama-3.3-70b-versatile"
 HANDBOOK_PATH = Path(__file__).parent / "data" / "handbook.md"
+# The search index is persisted next to the handbook and rebuilt when the handbook changes
+HANDBOOK_CHUNKS_PATH = HANDBOOK_PATH.with_suffix(".chunks.json")
+# Embeddings are stored as FP16 and memory-mapped: half the size, and loading is free
+HANDBOOK_EMBEDDINGS_PATH = HANDBOOK_PATH.with_suffix(".emb.fp16.npy")
+# Number of handbook sections returned per search
+TOP_K = 5
+# Set BATCH_MODE=groq to answer the example queries through the Groq Batch API
+BATCH_MODE = os.getenv("BATCH_MODE")
+# Seconds to wait for a batch before falling back to synchronous requests
+BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", "600"))
 
 
 # --------------------------------------------------------------
@@ -30,36 +69,133 @@ class Citation(BaseModel):
 
 class HandbookAnswer(BaseModel):
     """The final, comprehensive answer supported by citations."""
+    kind: Literal["handbook"] = Field(description="Always 'handbook' for answers based on the handbook.")
     answer: str = Field(description="The clear, comprehensive answer to the user's question.")
     citations: List[Citation] = Field(description="A list of 2-4 key citations from the handbook content.")
 
 
-# Define the JSON schema for structured output
-HANDBOOK_ANSWER_SCHEMA = HandbookAnswer.model_json_schema()
+class DirectAnswer(BaseModel):
+    """An answer given without consulting the handbook."""
+    kind: Literal["direct"] = Field(description="Always 'direct' for answers given without the handbook.")
+    answer: str = Field(description="The clear, concise answer to the user's question.")
+    citations: List[Citation] = Field(default_factory=list, description="Always an empty list.")
+
+
+# Either answer shape; pydantic dispatches on the 'kind' field the model emits
+AgentOutput = Annotated[Union[HandbookAnswer, DirectAnswer], Field(discriminator="kind")]
+
+# Validates the model's JSON string directly with the compiled core schema
+AGENT_OUTPUT_ADAPTER = TypeAdapter(AgentOutput)
+# Define the JSON schema for structured output once, read-only so it is safe to share between tasks
+AGENT_OUTPUT_SCHEMA = MappingProxyType(AGENT_OUTPUT_ADAPTER.json_schema())
 
 
 # --------------------------------------------------------------
 # Handbook search function (called as a tool)
 # ------------------------------------------------------------------------------------------------
-def search_handbook(query: str) -> str:
-    """Retrieve the full AI implementation handbook content for the agent to interpret.
+_INDEX_LOCK = threading.Lock()
+# Numbered headings up to three levels deep, e.g. '### 2.1 Impact Assessment (IAMA)'
+_SECTION_RE = re.compile(r"^(#{1,3})\s+([\d.]+)\s+(.*)$", re.M)
+# Bump when the chunking changes so indexes built by older code are rebuilt
+_INDEX_VERSION = 3
+
+
+def build_index() -> tuple[list, np.ndarray]:
+    """Split the handbook into sections, embed them and persist the index next to the handbook.
+
+    Returns: The list of chunks (`{"depth", "section", "title", "text"}` dicts) and their
+        normalized embeddings.
+    """
+    # Stat before reading, so an edit made while building triggers another rebuild
+    mtime = HANDBOOK_PATH.stat().st_mtime
+    handbook_content = HANDBOOK_PATH.read_text(encoding="utf-8")
+
+    # Single pass over the headings: each chunk runs from its heading to the next one
+    chunks = []
+    matches = list(_SECTION_RE.finditer(handbook_content))
+    preamble = handbook_content[:matches[0].start() if matches else len(handbook_content)].strip()
+    if preamble:
+        chunks.append({"depth": 0, "section": "", "title": "", "text": preamble})
+    # Headings with no body of their own (e.g. '## 2. Mandatory Steps') would become tiny
+    # chunks that crowd out real content, so they are prepended to the next chunk instead
+    pending_headings = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(handbook_content)
+        if not handbook_content[match.end():end].strip():
+            pending_headings.append(match.group(0).strip())
+            continue
+        chunks.append({
+            "depth": len(match.group(1)),
+            "section": match.group(2).rstrip("."),
+            "title": match.group(3).strip(),
+            "text": "\n\n".join(pending_headings + [handbook_content[match.start():end].strip()]),
+        })
+        pending_headings = []
+
+    # Embed every chunk in one batched call; the model picks the GPU when there is one,
+    # where larger batches keep it busy
+    embedder = get_embedder()
+    embeddings = embedder.encode(
+        [chunk["text"] for chunk in chunks],
+        batch_size=256 if embedder.device.type == "cuda" else 64,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    embeddings = np.asarray(embeddings, dtype=np.float16)
+
+    # Write each file to a temp path and swap it in atomically. The metadata, which
+    # marks the index as fresh, goes last so a crash never validates stale embeddings.
+    embeddings_tmp = HANDBOOK_EMBEDDINGS_PATH.with_name(HANDBOOK_EMBEDDINGS_PATH.name + ".tmp")
+    with open(embeddings_tmp, "wb") as f:
+        np.save(f, embeddings)
+    os.replace(embeddings_tmp, HANDBOOK_EMBEDDINGS_PATH)
+
+    chunks_tmp = HANDBOOK_CHUNKS_PATH.with_name(HANDBOOK_CHUNKS_PATH.name + ".tmp")
+    chunks_tmp.write_bytes(
+        orjson.dumps({
+            "version": _INDEX_VERSION,
+            "mtime": mtime,
+            "chunks": chunks,
+        })
+    )
+    os.replace(chunks_tmp, HANDBOOK_CHUNKS_PATH)
+    return chunks, embeddings
+
+
+@functools.lru_cache(maxsize=1)
+def load_index(mtime: float) -> tuple[list, np.ndarray]:
+    """Load the persisted index, rebuilding it if it was built from an older handbook."""
+    with _INDEX_LOCK:
+        if HANDBOOK_CHUNKS_PATH.exists() and HANDBOOK_EMBEDDINGS_PATH.exists():
+            index = orjson.loads(HANDBOOK_CHUNKS_PATH.read_bytes())
+            if index.get("version") == _INDEX_VERSION and index["mtime"] == mtime:
+                embeddings = np.load(HANDBOOK_EMBEDDINGS_PATH, mmap_mode="r")
+                if len(embeddings) == len(index["chunks"]):
+                    return index["chunks"], embeddings
+        return build_index()
 
-    Note: The query parameter is accepted but not used - we return the full handbook.
-    In a real RAG application, you would implement semantic search to retrieve only relevant sections.
+
+def search_handbook(query: str) -> str:
+    """Retrieve the handbook sections most relevant to the query.
 
     Args:
-        query: The user's question, used for context.
+        query: The user's question, used to rank the handbook sections.
 
-    Returns: The full handbook content as a string, or an error message.
+    Returns: The top matching sections joined as a string, or an error message.
     """
     if not HANDBOOK_PATH.exists():
         return "ERROR: Handbook file not found at expected path."
 
     try:
-        handbook_content = HANDBOOK_PATH.read_text(encoding="utf-8")
-        return handbook_content
+        chunks, embeddings = load_index(HANDBOOK_PATH.stat().st_mtime)
+        query_embedding = get_embedder().encode(query, normalize_embeddings=True)
+        # FP16 precision loss is negligible for top-k ranking; compute in FP32
+        similarities = embeddings.astype(np.float32) @ np.asarray(query_embedding, dtype=np.float32)
+        top_indices = np.argsort(-similarities)[:TOP_K]
+        return "\n\n".join(chunks[i]["text"] for i in top_indices)
     except Exception as e:
-        return f"ERROR: Could not read handbook file: {e}"
+        return f"ERROR: Could not search handbook: {e}"
 
 
 # --------------------------------------------------------------
@@ -72,7 +208,7 @@ tools = [
         "type": "function",
         "function": {
             "name": "search_handbook",
-            "description": "Retrieve the AI implementation handbook content. Use this when the user asks questions about AI implementation requirements, regulations, or procedures for Dutch government organizations.",
+            "description": "Search the AI implementation handbook for the sections most relevant to a query. Use this when the user asks questions about AI implementation requirements, regulations, or procedures for Dutch government organizations.",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -94,43 +230,155 @@ AVAILABLE_FUNCTIONS = {
 }
 
 
+# --------------------------------------------------------------
+# Incremental parsing of streamed answers
+# ------------------------------------------------------------------------------------------------
+
+
+class AnswerStream:
+    """Parse a streamed AgentOutput JSON body as it arrives.
+
+    The text inside the top-level `answer` string is passed to `on_answer_delta` piece
+    by piece as the deltas come in, and each citation is validated as soon as its
+    object closes so a malformed stream fails early.
+    """
+
+    def __init__(self, on_answer_delta: Optional[Callable[[str], None]] = None):
+        self.on_answer_delta = on_answer_delta
+        # One ijson push parser for the structure (citations)
+        self._events = ijson.sendable_list()
+        self._parser = ijson.parse_coro(self._events)
+        self._citation = None
+        # Character scanner state for the live `answer` text; ijson only yields
+        # a string once it is complete, which for `answer` is most of the output
+        self._depth = 0
+        self._in_string = False
+        self._escape = ""
+        self._expect_key = False
+        self._key = None
+        self._key_chars = None
+        self._in_answer = False
+
+    def feed(self, delta: str):
+        if self.on_answer_delta is not None:
+            self._scan(delta)
+
+        self._parser.send(delta.encode("utf-8"))
+        for prefix, event, value in self._events:
+            if prefix == "citations.item" and event == "start_map":
+                self._citation = ObjectBuilder()
+            if self._citation is not None:
+                self._citation.event(event, value)
+                if prefix == "citations.item" and event == "end_map":
+                    Citation.model_validate(self._citation.value)
+                    self._citation = None
+        del self._events[:]
+
+    def _scan(self, delta: str):
+        answer_text = []
+        for char in delta:
+            if self._in_string:
+                if self._escape:
+                    self._escape += char
+                    if not self._escape_complete():
+                        continue
+                    char = orjson.loads(f'"{self._escape}"')
+                    self._escape = ""
+                elif char == "\\":
+                    self._escape = char
+                    continue
+                elif char == '"':
+                    self._in_string = False
+                    self._in_answer = False
+                    if self._key_chars is not None:
+                        self._key = "".join(self._key_chars)
+                        self._key_chars = None
+                    continue
+                if self._in_answer:
+                    answer_text.append(char)
+                elif self._key_chars is not None:
+                    self._key_chars.append(char)
+            elif char == '"':
+                self._in_string = True
+                # Only strings directly inside the top-level object are keys or the answer
+                if self._depth == 1 and self._expect_key:
+                    self._key_chars = []
+                elif self._depth == 1 and self._key == "answer":
+                    self._in_answer = True
+            elif char in "{[":
+                self._depth += 1
+                self._expect_key = char == "{" and self._depth == 1
+            elif char in "}]":
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                self._expect_key = True
+            elif char == ":" and self._depth == 1:
+                self._expect_key = False
+
+        if answer_text:
+            self.on_answer_delta("".join(answer_text))
+
+    def _escape_complete(self) -> bool:
+        if self._escape[1] != "u":
+            return len(self._escape) == 2
+        if len(self._escape) < 6:
+            return False
+        # A high surrogate can only be decoded together with the low surrogate after it
+        if 0xD800 <= int(self._escape[2:6], 16) <= 0xDBFF:
+            return len(self._escape) == 12
+        return True
+
+
 # --------------------------------------------------------------
 # Agent function that uses tools dynamically
 # ------------------------------------------------------------------------------------------------
 
+# The system prompt is identical for every call of a conversation and messages are only
+# ever appended, so each call extends the previous one's prefix and Groq can reuse it
+# from its prompt cache instead of prefilling the retrieved handbook content again.
+SYSTEM_PROMPT = "You are a helpful assistant for Dutch government organizations. You can help answer questions about AI implementation policies and regulations by using the 'search_handbook' tool. If asked what you can do, simply explain your capabilities without searching the handbook. When you answer from retrieved handbook content, provide a clear, comprehensive answer and include only the most important citations (2-4 maximum) that reference the primary sections where the key information comes from. Each citation should include a brief text excerpt and the section number (e.g., '2.1', '3.2'). Do not cite every detail - only cite the main sources. Your final output MUST be a JSON object conforming to the provided schema."
+FINAL_ANSWER_PROMPT = "Now produce the JSON answer. If you used the retrieved handbook content, set 'kind' to 'handbook' and include 2-4 citations. Otherwise set 'kind' to 'direct' and return an empty list for 'citations'."
+
 
-def ask_agent(query: str) -> HandbookAnswer:
-    """Ask the agent a question. It will decide whether to search the handbook."""
+async def ask_agent(query: str, on_answer_delta: Optional[Callable[[str], None]] = None) -> AgentOutput:
+    """Ask the agent a question. It will decide whether to search the handbook.
+
+    The final answer is streamed; `on_answer_delta` is called with each piece of the
+    answer text as it arrives, before the citations and the full validation are done.
+    """
     
     # 1. Initial Prompt and Tool Check
-    messages = [{"role": "user", "content": query}]
-    SYSTEM_PROMPT = "You are a helpful assistant for Dutch government organizations. You can help answer questions about AI implementation policies and regulations by using the 'search_handbook' tool. If asked what you can do, simply explain your capabilities without searching the handbook. Your final output MUST be a JSON object conforming to the HandbookAnswer schema."
-
-    initial_response = client.chat.completions.create(
+    # The chat completions API takes the system prompt as the first message
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": query},
+    ]
+
+    initial_response = await async_create_completion(
+        get_client(),
         model=MODEL,
         messages=messages,
         tools=tools,
         tool_choice="auto", # Let the model decide if it needs the tool
-        system_prompt=SYSTEM_PROMPT,
     )
 
     # 2. Check for Tool Call
     response_message = initial_response.choices[0].message
+    messages.append(response_message)
     
     if response_message.tool_calls:
         print(f"Tool called: {response_message.tool_calls[0].function.name}")
         
         # 3. Process Tool Calls and Get Function Output
-        messages.append(response_message)
-        
         for tool_call in response_message.tool_calls:
             function_name = tool_call.function.name
-            function_args = json.loads(tool_call.function.arguments)
+            function_args = orjson.loads(tool_call.function.arguments)
             
             if function_name in AVAILABLE_FUNCTIONS:
                 # Call the local Python function
                 function_to_call = AVAILABLE_FUNCTIONS[function_name]
-                function_response_text = function_to_call(**function_args)
+                # Run the local tool off the event loop so other queries keep flowing
+                function_response_text = await asyncio.to_thread(function_to_call, **function_args)
                 print(f"Handbook retrieved ({len(function_response_text)} chars)")
                 
                 # Append the tool's output back to the messages list
@@ -145,43 +393,163 @@ def ask_agent(query: str) -> HandbookAnswer:
             else:
                 raise ValueError(f"Unknown function: {function_name}")
         
-        # 4. Final Generation with Tool Output and Structured Format
+        # 4. Final Generation with Tool Output
         print("Generating final structured answer...")
-        
-        final_completion = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            system_prompt=f"{SYSTEM_PROMPT} Use the retrieved handbook content to answer the question. Provide a clear, comprehensive answer. Include only the most important citations (2-4 maximum) that reference the primary sections where the key information comes from. Each citation should include a brief text excerpt and the section number (e.g., '2.1', '3.2'). Do not cite every detail - only cite the main sources.",
-            response_format={
-                "type": "json_object",
-                "schema": HANDBOOK_ANSWER_SCHEMA
-            },
-            temperature=0.0 # Low temp for factual/structured response
-        )
-        
-        # Extract and parse the structured JSON response
-        json_string = final_completion.choices[0].message.content
-        parsed_data = json.loads(json_string)
-        return HandbookAnswer.model_validate(parsed_data)
-        
     else:
         # 5. Direct Response (No tool needed)
         print("No tool call needed, responding directly\n")
-        
-        # Generate structured output even for direct answers
-        direct_completion = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            system_prompt=f"{SYSTEM_PROMPT} Answer directly. Since you did not use the tool, return an empty list for 'citations'.",
-            response_format={
-                "type": "json_object",
-                "schema": HANDBOOK_ANSWER_SCHEMA
+
+    # Both cases request the same schema; the 'kind' field tells the answers apart
+    json_string = await async_cached_completion(
+        get_client,
+        messages=[*messages, {"role": "user", "content": FINAL_ANSWER_PROMPT}],
+        schema=AGENT_OUTPUT_SCHEMA,
+        model=MODEL,
+        on_delta=AnswerStream(on_answer_delta).feed,
+        # Match similar questions on the question alone, not the fixed closing
+        # instruction, and never reuse an answer across the two branches
+        semantic_text=query,
+        semantic_scope="handbook" if response_message.tool_calls else "direct",
+        # Only well-formed answers are cached
+        validate=AGENT_OUTPUT_ADAPTER.validate_json,
+        temperature=0.0 # Low temp for factual/structured response
+    )
+
+    # Validate the complete structured JSON response
+    return AGENT_OUTPUT_ADAPTER.validate_json(json_string)
+
+
+# --------------------------------------------------------------
+# Offline batch answering (Groq Batch API)
+# ------------------------------------------------------------------------------------------------
+
+
+async def ask_agent_batch(queries: List[str]) -> list:
+    """Answer queries through the Groq Batch API, which costs half of synchronous requests.
+
+    A batch cannot interleave local tool calls, so the relevant handbook sections are
+    retrieved up front and each query is answered in a single structured request.
+    Queries without a valid batch result by BATCH_TIMEOUT fall back to `ask_agent`.
+
+    Returns: An AgentOutput or an exception per query, in the order of `queries`.
+    """
+    lines = []
+    for i, query in enumerate(queries):
+        handbook_sections = await asyncio.to_thread(search_handbook, query)
+        lines.append(orjson.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": MODEL,
+                "messages": [
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": f"{query}\n\nRetrieved handbook content:\n\n{handbook_sections}"},
+                    # Same closing turn as ask_agent, which tells the model to emit 'kind'
+                    {"role": "user", "content": FINAL_ANSWER_PROMPT},
+                ],
+                "response_format": {
+                    "type": "json_object",
+                    "schema": dict(AGENT_OUTPUT_SCHEMA)
+                },
+                "temperature": 0.0,
             },
-            temperature=0.0
+        }))
+
+    batch_file = await get_client().files.create(
+        file=("handbook_queries.jsonl", b"\n".join(lines)), purpose="batch"
+    )
+    batch = await get_client().batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    print(f"Submitted batch {batch.id} with {len(queries)} queries")
+
+    # Poll with exponential backoff until the batch finishes or the window runs out
+    deadline = time.monotonic() + BATCH_TIMEOUT
+    delay = 1.0
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        if time.monotonic() >= deadline:
+            print(f"Batch {batch.id} not done after {BATCH_TIMEOUT:.0f}s, falling back to synchronous requests")
+            await get_client().batches.cancel(batch.id)
+            break
+        await asyncio.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+        delay = min(delay * 2, 60)
+        batch = await get_client().batches.retrieve(batch.id)
+
+    results = [None] * len(queries)
+    if batch.status == "completed" and batch.output_file_id:
+        output = await get_client().files.content(batch.output_file_id)
+        for line in (await output.read()).splitlines():
+            if not line.strip():
+                continue
+            item = orjson.loads(line)
+            response = item.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            json_string = response["body"]["choices"][0]["message"]["content"]
+            try:
+                results[int(item["custom_id"])] = AGENT_OUTPUT_ADAPTER.validate_json(json_string)
+            except Exception as e:
+                # Leave the slot empty so the query is retried synchronously below
+                print(f"Invalid batch answer for '{queries[int(item['custom_id'])]}': {e}")
+
+    # Anything the batch did not answer goes through the regular agent
+    missing = [i for i, result in enumerate(results) if result is None]
+    fallback_results = await asyncio.gather(
+        *[ask_agent(queries[i]) for i in missing],
+        return_exceptions=True,
+    )
+    for i, result in zip(missing, fallback_results):
+        results[i] = result
+    return results
+
+
+# --------------------------------------------------------------
+# Multi-query runner
+# ------------------------------------------------------------------------------------------------
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase a query and strip punctuation and extra whitespace for duplicate detection."""
+    return " ".join(_PUNCTUATION_RE.sub("", query.lower()).split())
+
+
+async def ask_agent_many(queries: List[str], on_answer_delta: Optional[Callable[[str, str], None]] = None) -> list:
+    """Answer several queries concurrently, asking each distinct query only once.
+
+    Distinct queries are dispatched shortest first, so requests with similar prefill
+    sizes are in flight together. `on_answer_delta` is called with `(query, text)` for
+    each piece of answer text as it streams in (not in batch mode).
+
+    Returns: An AgentOutput or an exception per query, in the order of `queries`.
+    """
+    buckets = defaultdict(list)
+    for i, query in enumerate(queries):
+        buckets[normalize_query(query)].append(i)
+    unique = sorted(buckets.values(), key=lambda indices: len(queries[indices[0]]))
+    unique_queries = [queries[indices[0]] for indices in unique]
+
+    if BATCH_MODE == "groq":
+        unique_results = await ask_agent_batch(unique_queries)
+    else:
+        unique_results = await asyncio.gather(
+            *[
+                ask_agent(query, on_answer_delta=functools.partial(on_answer_delta, query) if on_answer_delta else None)
+                for query in unique_queries
+            ],
+            return_exceptions=True,
         )
-        json_string = direct_completion.choices[0].message.content
-        parsed_data = json.loads(json_string)
-        return HandbookAnswer.model_validate(parsed_data)
+
+    # Map each result back to every original position of its query
+    results = [None] * len(queries)
+    for indices, result in zip(unique, unique_results):
+        for i in indices:
+            results[i] = result
+    return results
 
 
 # --------------------------------------------------------------
@@ -194,23 +562,137 @@ example_queries = [
     "Do I need to perform an IAMA for a chatbot that answers citizen questions?",
 ]
 
-# Test with example queries
-if __name__ == "__main__":
-    for query in example_queries:
+def print_result(result, show_answer: bool = True):
+    """Print an agent answer (or the error it raised) with its citations.
+
+    Pass `show_answer=False` when the answer text was already streamed to the terminal.
+    """
+    if isinstance(result, Exception):
+        print(f"❌ An error occurred: {result}")
+        print("Ensure the 'data/handbook.md' file exists and your GROQ_API_KEY is set.")
+    else:
+        if show_answer:
+            print(f"Answer: {result.answer}\n")
+        if result.citations:
+            print("Citations:")
+            for citation in result.citations:
+                print(f"  Section {citation.section}: {citation.text[:100]}...")
+        else:
+            print("Citations: None (Direct response or no relevant policy found)")
+
+
+async def main():
+    """Run the example queries concurrently and print the results in order."""
+    streaming_query = None
+    streamed_queries = set()
+
+    def print_answer_delta(query: str, delta: str):
+        # Answers stream concurrently; label the output whenever it switches query
+        nonlocal streaming_query
+        streamed_queries.add(query)
+        if query != streaming_query:
+            print(f"\n⏩ [{query}] ", end="")
+            streaming_query = query
+        print(delta, end="", flush=True)
+
+    results = await ask_agent_many(example_queries, on_answer_delta=print_answer_delta)
+    print()
+
+    for query, result in zip(example_queries, results):
         print(f"\n{'=' * 60}")
         print(f"Query: {query}")
         print(f"{'=' * 60}\n")
-        
-        try:
-            result = ask_agent(query)
-            print(f"Answer: {result.answer}\n")
-            if result.citations:
-                print("Citations:")
-                for citation in result.citations:
-                    print(f"  Section {citation.section}: {citation.text[:100]}...")
-            else:
-                print("Citations: None (Direct response or no relevant policy found)")
-        except Exception as e:
-            print(f"❌ An error occurred: {e}")
-            print("Ensure the 'data/handbook.md' file exists and your GROQ_API_KEY is set.")
-        print()
\ No newline at end of file
+        # Streamed answers are already on screen, so only their citations are left to show
+        print_result(result, show_answer=query not in streamed_queries)
+        print()
+
+
+# --------------------------------------------------------------
+# Persistent process modes (HTTP server and REPL)
+# --------------------------------------------------------------
+
+
+class AskRequest(BaseModel):
+    """Request body for POST /ask."""
+    query: str
+
+
+def warm_up():
+    """Pay the one-time costs up front: search index, embedding model and Groq client."""
+    if HANDBOOK_PATH.exists():
+        load_index(HANDBOOK_PATH.stat().st_mtime)
+    get_embedder()
+    get_client()
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000):
+    """Keep the agent loaded and answer queries over HTTP: POST /ask {"query": "..."}."""
+    import uvicorn
+    from fastapi import FastAPI
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: FastAPI):
+        warm_up()
+        yield
+
+    app = FastAPI(title="Handbook agent", lifespan=lifespan)
+
+    @app.post("/ask")
+    async def ask(request: AskRequest) -> AgentOutput:
+        return await ask_agent(request.query)
+
+    uvicorn.run(app, host=host, port=port)
+
+
+def repl():
+    """Keep the agent loaded and answer queries typed interactively."""
+    from prompt_toolkit import PromptSession
+
+    async def loop():
+        warm_up()
+        session = PromptSession()
+        print("Type 'quit' or 'exit' to end the session.\n")
+        while True:
+            try:
+                query = (await session.prompt_async("You: ")).strip()
+            except (EOFError, KeyboardInterrupt):
+                break
+            if not query:
+                continue
+            if query.lower() in ["quit", "exit", "q"]:
+                break
+            try:
+                result = await ask_agent(query)
+            except Exception as e:
+                result = e
+            print()
+            print_result(result)
+            print()
+
+    asyncio.run(loop())
+
+
+def build_cli():
+    """Build the command line interface; typer (with click and rich) is only imported here."""
+    import typer
+
+    cli = typer.Typer(help="Answer questions about the AI implementation handbook.")
+
+    @cli.callback(invoke_without_command=True)
+    def run_examples(ctx: typer.Context):
+        """Run the example queries when no subcommand is given."""
+        if ctx.invoked_subcommand is None:
+            asyncio.run(main())
+
+    cli.command()(serve)
+    cli.command()(repl)
+    return cli
+
+
+# Test with example queries
+if __name__ == "__main__":
+    # A plain run needs no argument parsing, so it skips loading the CLI layer
+    if len(sys.argv) == 1:
+        asyncio.run(main())
+    else:
+        build_cli()()
@@ -97,8 +97,10 @@ def ask_agent(query: str) -> AgentAnswer:
         print("No tool call needed - responding directly")
         final_response = client.chat.completions.create( # Use 'create' for the final response as well
             model=MODEL,
-            messages=input_messages,
-            system_prompt=SYSTEM_PROMPT,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                *input_messages,
+            ],
             # Remove text_format and parse, these features may not be directly supported
             # in the standard Groq SDK structure. You'll need to adapt the parsing logic
             # or rely on the JSON mode if supported.
@@ -0,0 +1,279 @@
+import asyncio
+import functools
+import hashlib
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import orjson
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+CACHE_PATH = Path(__file__).parent / "data" / "llm_cache.sqlite3"
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Minimum cosine similarity for a semantic cache hit. Tune per workload:
+# too low returns answers to different questions, too high never hits.
+SIMILARITY_THRESHOLD = 0.92
+
+
+# --------------------------------------------------------------
+# Completion calls with retries on transient errors
+# --------------------------------------------------------------
+
+def _is_transient(error: BaseException) -> bool:
+    """Only network failures, rate limits and server errors are worth retrying;
+    anything else (bad API key, invalid request) fails immediately."""
+    # groq is imported here so that cache hits never pay for importing it
+    import groq
+
+    return isinstance(
+        error, (groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError)
+    )
+
+
+_retry_transient = retry(
+    retry=retry_if_exception(_is_transient),
+    wait=wait_exponential_jitter(initial=1, max=30),
+    stop=stop_after_attempt(5),
+    reraise=True,
+)
+
+
+@_retry_transient
+def create_completion(client, **kwargs):
+    """Call `client.chat.completions.create`, retrying transient API errors."""
+    return client.chat.completions.create(**kwargs)
+
+
+@_retry_transient
+async def async_create_completion(client, **kwargs):
+    """Same as `create_completion`, for an `AsyncGroq` client."""
+    return await client.chat.completions.create(**kwargs)
+
+
+# --------------------------------------------------------------
+# Storage
+# --------------------------------------------------------------
+
+# The async API runs lookups in worker threads, so serialize use of the shared connection
+_DB_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_connection() -> sqlite3.Connection:
+    """Open the cache database, creating the tables on first use."""
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS exact_cache (key TEXT PRIMARY KEY, response JSON)"
+    )
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS sem_cache (scope TEXT, embedding BLOB, response JSON)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS sem_cache_scope ON sem_cache (scope)"
+    )
+    connection.commit()
+    return connection
+
+
+# Cache lookups and the handbook index may ask for the embedder from different threads
+# at once, and lru_cache alone would let both of them load the model
+_EMBEDDER_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _load_embedder():
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+def get_embedder():
+    """Load the sentence-transformer once; shared by every caller in the process."""
+    with _EMBEDDER_LOCK:
+        return _load_embedder()
+
+
+def _embed(text: str) -> np.ndarray:
+    """Return the L2-normalized float32 embedding of a text."""
+    embedding = get_embedder().encode(text, normalize_embeddings=True)
+    return np.asarray(embedding, dtype=np.float32)
+
+
+def _hash(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _dumps(value) -> bytes:
+    # Tool-call messages are SDK objects, so serialize those via pydantic.
+    return orjson.dumps(value, option=orjson.OPT_SORT_KEYS, default=lambda o: o.model_dump())
+
+
+def _user_text(messages: list) -> str:
+    return "\n".join(
+        message.get("content") or ""
+        for message in messages
+        if isinstance(message, dict) and message.get("role") == "user"
+    )
+
+
+# --------------------------------------------------------------
+# Cached completion
+# --------------------------------------------------------------
+
+def _lookup(messages: list, schema: Mapping, model: str, kwargs: dict, semantic: bool, semantic_text: Optional[str], semantic_scope: str):
+    """Look a request up in the cache.
+
+    Returns: A `(content, key, scope, embedding)` tuple; `content` is None on a miss
+    and the remaining values are what `_store` needs to record the fresh response.
+    """
+    system_prompts = [
+        message.get("content") or ""
+        for message in messages
+        if isinstance(message, dict) and message.get("role") == "system"
+    ]
+    options = _dumps(kwargs)
+    key = _hash(model, _dumps(messages), str(dict(schema)), options)
+    scope = _hash(model, _dumps(system_prompts), str(dict(schema)), options, semantic_scope)
+
+    connection = _get_connection()
+    with _DB_LOCK:
+        row = connection.execute(
+            "SELECT response FROM exact_cache WHERE key = ?", (key,)
+        ).fetchone()
+    if row is not None:
+        return row[0], key, scope, None
+    if not semantic:
+        return None, key, scope, None
+
+    query_embedding = _embed(_user_text(messages) if semantic_text is None else semantic_text)
+    with _DB_LOCK:
+        rows = connection.execute(
+            "SELECT embedding, response FROM sem_cache WHERE scope = ?", (scope,)
+        ).fetchall()
+    if rows:
+        matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for blob, _ in rows])
+        similarities = matrix @ query_embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] >= SIMILARITY_THRESHOLD:
+            return rows[best][1], key, scope, query_embedding
+
+    return None, key, scope, query_embedding
+
+
+def _store(key: str, scope: str, embedding: np.ndarray, content: str):
+    connection = _get_connection()
+    with _DB_LOCK:
+        connection.execute(
+            "INSERT OR REPLACE INTO exact_cache (key, response) VALUES (?, ?)", (key, content)
+        )
+        if embedding is not None:
+            connection.execute(
+                "INSERT INTO sem_cache (scope, embedding, response) VALUES (?, ?, ?)",
+                (scope, embedding.tobytes(), content),
+            )
+        connection.commit()
+
+
+def cached_completion(client, messages: list, schema: Mapping, model: str, validate=None, semantic: bool = True, semantic_text: Optional[str] = None, semantic_scope: str = "", **kwargs) -> str:
+    """Return the JSON content of a structured chat completion, using the cache when possible.
+
+    Lookup first tries an exact hash of the full request, then falls back to the
+    cosine similarity of the user messages against earlier requests that share
+    the same model, system prompt, schema and parameters. The system prompt is part
+    of that scope so answers never leak between differently-prompted callers.
+
+    The embedding model only sees the first 256 tokens of the user messages, so
+    requests that differ further in (e.g. summaries of long documents sharing a
+    fixed instruction and site boilerplate) should pass `semantic=False`.
+
+    Args:
+        client: A Groq client, or a function returning one. A function is only called
+            on a cache miss, so cache hits skip creating the client altogether.
+        messages: The chat messages to send.
+        schema: The JSON schema the response must follow (a dict or read-only mapping).
+        model: The model name.
+        validate: Optional function that raises if a response is invalid (e.g. a
+            pydantic `model_validate_json`). Fresh responses are only cached once it passes.
+        semantic: Whether to fall back to similarity lookup on an exact-cache miss.
+        semantic_text: The text to compare for similarity lookup, instead of the user
+            messages. Pass the original question when later user turns are fixed
+            instructions that would otherwise dominate the embedding.
+        semantic_scope: Extra label that similarity hits must share (e.g. which branch
+            of an agent produced the conversation).
+        **kwargs: Extra arguments for `chat.completions.create` (e.g. temperature).
+
+    Returns: The raw JSON string returned by the model.
+    """
+    content, key, scope, embedding = _lookup(
+        messages, schema, model, kwargs, semantic, semantic_text, semantic_scope
+    )
+    if content is not None:
+        return content
+
+    response = create_completion(
+        client() if callable(client) else client,
+        model=model,
+        messages=messages,
+        response_format={
+            "type": "json_object",
+            # Schemas may be read-only MappingProxyType views, which are not JSON serializable
+            "schema": dict(schema)
+        },
+        **kwargs,
+    )
+    content = response.choices[0].message.content
+    if validate is not None:
+        validate(content)
+    _store(key, scope, embedding, content)
+    return content
+
+
+async def async_cached_completion(client, messages: list, schema: Mapping, model: str, on_delta=None, validate=None, semantic: bool = True, semantic_text: Optional[str] = None, semantic_scope: str = "", **kwargs) -> str:
+    """Same as `cached_completion`, for an `AsyncGroq` client.
+
+    If `on_delta` is given the completion is streamed and `on_delta` is called with
+    each piece of content as it arrives (or once with the whole cached response).
+    """
+    # SQLite and the embedding model are blocking, so keep them off the event loop
+    content, key, scope, embedding = await asyncio.to_thread(
+        _lookup, messages, schema, model, kwargs, semantic, semantic_text, semantic_scope
+    )
+    if content is not None:
+        if on_delta is not None:
+            on_delta(content)
+        return content
+
+    response = await async_create_completion(
+        client() if callable(client) else client,
+        model=model,
+        messages=messages,
+        response_format={
+            "type": "json_object",
+            # Schemas may be read-only MappingProxyType views, which are not JSON serializable
+            "schema": dict(schema)
+        },
+        stream=on_delta is not None,
+        **kwargs,
+    )
+    if on_delta is None:
+        content = response.choices[0].message.content
+    else:
+        parts = []
+        async for chunk in response:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                on_delta(delta)
+        content = "".join(parts)
+
+    if validate is not None:
+        validate(content)
+    await asyncio.to_thread(_store, key, scope, embedding, content)
+    return content
@@ -1,8 +1,15 @@
+import functools
 from pathlib import Path
 
 HANDBOOK_PATH = Path(__file__).parent.parent / "data" / "handbook.md"
 
 
+@functools.lru_cache(maxsize=1)
+def _load_handbook(mtime: float) -> str:
+    """Read and decode the handbook once per version (keyed on its mtime)."""
+    return HANDBOOK_PATH.read_text(encoding="utf-8")
+
+
 def search_handbook(query: str) -> str:
     """Retrieve the handbook content for the agent to interpret.
 
@@ -13,7 +20,7 @@ def search_handbook(query: str) -> str:
     """
     if not HANDBOOK_PATH.exists():
         return "Handbook not found."
-    return HANDBOOK_PATH.read_text(encoding="utf-8")
+    return _load_handbook(HANDBOOK_PATH.stat().st_mtime)
 
 
 def get_tool_definition():